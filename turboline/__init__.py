@@ -1,2 +1,4 @@
 from .turboline import TurboLine
 from .turboline import TurboLineCmd
+from .turboline import TurboLineKeymap
+from .turboline import TurboLineMultiplexer
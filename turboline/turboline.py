@@ -3,12 +3,22 @@
 """A simple but powerful alternative to the Cmd module for Python programs using Curses."""
 
 import curses
+import curses.ascii
 import curses.textpad
 import re
 import cmd
+import collections.abc
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
 
 __license__ = "LGPL-3.0"
 
+# The pad backing a TurboLine grows (and is initially sized) in chunks of this many characters.
+PAD_CHUNK_SIZE = 64
+
 
 class TurboLineVisibilityInfo:
     """
@@ -16,7 +26,7 @@ class TurboLineVisibilityInfo:
     This information is used when refreshing the curses pad contained in the TurboLine.
     """
 
-    def __init__(self, content_pos_y, content_pos_x, top_y, top_x, bottom_y, bottom_x):
+    def __init__(self, content_pos_y, content_pos_x, top_y, top_x, bottom_y, bottom_x, first_line=0):
         """
         The constructor. Takes the initial parameters for the pad position.
         :param content_pos_y: The y-position of the content. This is usually 0, since we just show one line.
@@ -25,6 +35,8 @@ class TurboLineVisibilityInfo:
         :param top_x: The x-position of the top left corner position of the pad in the standard screen.
         :param bottom_y: The y-position of the bottom right corner position of the pad in the standard screen.
         :param bottom_x: The x-position of the bottom right corner position of the pad in the standard screen.
+        :param first_line: The index of the first input line shown. This is only used in multi-line mode,
+                           where the pad just holds the visible lines of the input.
         """
         self.content_pos_y = content_pos_y
         self.content_pos_x = content_pos_x
@@ -32,6 +44,7 @@ class TurboLineVisibilityInfo:
         self.top_x = top_x
         self.bottom_y = bottom_y
         self.bottom_x = bottom_x
+        self.first_line = first_line
 
 
 class TurboLineTextbox(curses.textpad.Textbox):
@@ -41,16 +54,62 @@ class TurboLineTextbox(curses.textpad.Textbox):
     text input more flexible, this adjusted Textbox utilizes a pad and shares the position information
     with the TurboLine implementation. On every input, the displayed position of the pad is validated
     and adjusted if the cursor is outside the displayed area.
+
+    The pad starts small and grows in chunks of PAD_CHUNK_SIZE characters as the content approaches
+    its right edge, so the cost of a TurboLine scales with its content rather than its maximum length.
     """
 
-    def __init__(self, target_pad, visibility_info):
+    def __init__(self, target_pad, visibility_info, max_length=None):
         """
         The constructor.
         :param target_pad: The target pad in which the Textbox should live.
         :param visibility_info: The visibility info from TurboLine implementation.
+        :param max_length: The maximum width the pad may grow to, or None for no upper bound.
         """
         super().__init__(target_pad, insert_mode=True)
         self.__visibility_info = visibility_info
+        self.__initial_capacity = target_pad.getmaxyx()[1]
+        self.max_length = max_length
+
+    def ensure_capacity(self, length):
+        """
+        Grows the pad in chunks, so it can hold a text of the given length with the cursor behind it.
+        The pad never grows beyond max_length.
+        :param length: The length of the text the pad has to hold.
+        """
+        rows, capacity = self.win.getmaxyx()
+        if length < capacity:
+            return
+        new_capacity = (length // PAD_CHUNK_SIZE + 1) * PAD_CHUNK_SIZE
+        if self.max_length is not None:
+            new_capacity = min(new_capacity, self.max_length)
+        if new_capacity > capacity:
+            self.win.resize(rows, new_capacity)
+
+    def shrink(self):
+        """
+        Shrinks the pad back to its initial size. Must only be called on a cleared pad,
+        since the content beyond the initial size is lost.
+        """
+        rows, capacity = self.win.getmaxyx()
+        if capacity > self.__initial_capacity:
+            self.win.resize(rows, self.__initial_capacity)
+
+    def set_text(self, text):
+        """
+        Replaces the content with the given text and puts the cursor behind it.
+        :param text: The new content.
+        """
+        self.win.clear()
+        self.ensure_capacity(len(text))
+        self.win.addstr(0, 0, text)
+
+    def clear(self):
+        """
+        Clears the content and shrinks the pad back to its initial size.
+        """
+        self.win.clear()
+        self.shrink()
 
     def edit(self, validate=None):
         """
@@ -65,18 +124,234 @@ class TurboLineTextbox(curses.textpad.Textbox):
             refresh_pad_visibility(self.win, self.__visibility_info)
 
             ch = self.win.getch()
-            if validate:
-                ch = validate(ch)
-            if not ch:
-                continue
-            if not self.do_command(ch):
+            if not self.process_key(ch, validate):
                 break
-            # if the window is being resized, we cannot refresh
-            if ch == 410:
-                raise InterruptedError
 
         return self.gather()
 
+    def process_key(self, ch, validate=None):
+        """
+        Processes a single key press. This is one step of the edit loop, which allows
+        several Textboxes to be driven by one input loop.
+        :param ch: The character code of the pressed key.
+        :param validate: The validation method (see edit).
+        :return: False, if the input is finished. True otherwise.
+        """
+        if validate:
+            ch = validate(ch)
+        if not ch:
+            return True
+        if curses.ascii.isprint(ch):
+            self._grow_before_insert()
+        if not self.do_command(ch):
+            return False
+        # Resizes are handled by the 'resize' action of the keymap. If it has been unbound,
+        # we cannot refresh and leave it to the caller.
+        if ch == curses.KEY_RESIZE:
+            raise InterruptedError
+        return True
+
+    def _grow_before_insert(self):
+        """
+        The Textbox drops the last character of the pad if a character is inserted into a full pad.
+        We therefore grow the pad if the cursor or the content is about to reach its right edge.
+        """
+        capacity = self.win.getmaxyx()[1]
+        cursor_y, cursor_x = self.win.getyx()
+        # Reading a character moves the cursor, so we have to put it back afterwards.
+        last_char = self.win.inch(cursor_y, capacity - 2) & curses.A_CHARTEXT
+        self.win.move(cursor_y, cursor_x)
+        if cursor_x >= capacity - 2 or last_char != ord(' '):
+            self.ensure_capacity(capacity)
+
+
+class TurboLineMultilineTextbox(TurboLineTextbox):
+    """
+    The Textbox used in multi-line mode. Instead of keeping the text in the pad, the input is kept in a
+    list of lines and the pad only holds the lines which are currently visible. The first visible line is
+    stored in the visibility info and moved along with the cursor, so the input scrolls vertically. Only
+    the visible lines are ever rendered, which keeps editing responsive no matter how long the input is.
+
+    Apart from the single-line controls, Enter inserts a line break, the arrow keys move between lines,
+    page up and page down scroll by one screen and CTRL + G finishes the input.
+    """
+
+    def __init__(self, target_pad, visibility_info, max_length=None):
+        """
+        The constructor.
+        :param target_pad: The target pad in which the Textbox should live. Its height is the number of visible lines.
+        :param visibility_info: The visibility info from TurboLine implementation.
+        :param max_length: The maximum length of a single line, or None for no upper bound.
+        """
+        super().__init__(target_pad, visibility_info, max_length)
+        self.__visibility_info = visibility_info
+        self.lines = ['']
+        self.cursor_line = 0
+        self.cursor_column = 0
+
+    def do_command(self, ch):
+        """
+        Process a single editing command on the list of lines.
+        :param ch: The character code of the command.
+        :return: 0, if the input is finished. 1 otherwise.
+        """
+        line = self.lines[self.cursor_line]
+        # Which part of the visible lines has to be rendered again: nothing, the cursor line or all of them.
+        changed = None
+
+        if curses.ascii.isprint(ch):
+            if self.max_length is None or len(line) < self.max_length - 1:
+                self.lines[self.cursor_line] = line[:self.cursor_column] + chr(ch) + line[self.cursor_column:]
+                self.cursor_column += 1
+                changed = 'line'
+        elif ch == curses.ascii.SOH:  # ^a
+            self.cursor_column = 0
+        elif ch in (curses.ascii.BS, curses.KEY_BACKSPACE):  # ^h
+            if self.cursor_column > 0:
+                self.lines[self.cursor_line] = line[:self.cursor_column - 1] + line[self.cursor_column:]
+                self.cursor_column -= 1
+                changed = 'line'
+            elif self.cursor_line > 0:
+                self.cursor_line -= 1
+                self.cursor_column = len(self.lines[self.cursor_line])
+                self.__join_with_next_line()
+                changed = 'all'
+        elif ch in (curses.ascii.STX, curses.KEY_LEFT):  # ^b
+            if self.cursor_column > 0:
+                self.cursor_column -= 1
+            elif self.cursor_line > 0:
+                self.cursor_line -= 1
+                self.cursor_column = len(self.lines[self.cursor_line])
+        elif ch == curses.ascii.EOT:  # ^d
+            if self.cursor_column < len(line):
+                self.lines[self.cursor_line] = line[:self.cursor_column] + line[self.cursor_column + 1:]
+                changed = 'line'
+            elif self.cursor_line < len(self.lines) - 1:
+                self.__join_with_next_line()
+                changed = 'all'
+        elif ch == curses.ascii.ENQ:  # ^e
+            self.cursor_column = len(line)
+        elif ch in (curses.ascii.ACK, curses.KEY_RIGHT):  # ^f
+            if self.cursor_column < len(line):
+                self.cursor_column += 1
+            elif self.cursor_line < len(self.lines) - 1:
+                self.cursor_line += 1
+                self.cursor_column = 0
+        elif ch == curses.ascii.BEL:  # ^g
+            return 0
+        elif ch == curses.ascii.NL:  # ^j
+            self.lines[self.cursor_line] = line[:self.cursor_column]
+            self.lines.insert(self.cursor_line + 1, line[self.cursor_column:])
+            self.cursor_line += 1
+            self.cursor_column = 0
+            changed = 'all'
+        elif ch == curses.ascii.VT:  # ^k
+            if line == '' and len(self.lines) > 1:
+                del self.lines[self.cursor_line]
+                self.cursor_line = min(self.cursor_line, len(self.lines) - 1)
+                self.cursor_column = 0
+                changed = 'all'
+            else:
+                self.lines[self.cursor_line] = line[:self.cursor_column]
+                changed = 'line'
+        elif ch == curses.ascii.FF:  # ^l
+            changed = 'all'
+        elif ch in (curses.ascii.SO, curses.KEY_DOWN):  # ^n
+            self.__move_cursor_line(1)
+        elif ch == curses.ascii.SI:  # ^o
+            self.lines.insert(self.cursor_line, '')
+            self.cursor_column = 0
+            changed = 'all'
+        elif ch in (curses.ascii.DLE, curses.KEY_UP):  # ^p
+            self.__move_cursor_line(-1)
+        elif ch == curses.KEY_PPAGE:
+            self.__move_cursor_line(-self.win.getmaxyx()[0])
+        elif ch == curses.KEY_NPAGE:
+            self.__move_cursor_line(self.win.getmaxyx()[0])
+
+        self.__render(changed)
+        return 1
+
+    def gather(self):
+        """
+        Collect and return the contents of all lines.
+        """
+        return '\n'.join(self.lines)
+
+    def set_text(self, text):
+        """
+        Replaces the content with the given text and puts the cursor behind it.
+        :param text: The new content. Line breaks separate the lines.
+        """
+        self.lines = text.split('\n')
+        self.cursor_line = len(self.lines) - 1
+        self.cursor_column = len(self.lines[-1])
+        self.win.clear()
+        self.__render('all')
+
+    def clear(self):
+        """
+        Clears the content and shrinks the pad back to its initial size.
+        """
+        self.lines = ['']
+        self.cursor_line = 0
+        self.cursor_column = 0
+        self.__visibility_info.first_line = 0
+        super().clear()
+
+    def _grow_before_insert(self):
+        """
+        The pad is grown while rendering the visible lines, so there is nothing to do here.
+        """
+        pass
+
+    def __move_cursor_line(self, offset):
+        """
+        Moves the cursor up or down by the given number of lines, keeping it inside the text.
+        :param offset: The number of lines to move (negative values move up).
+        """
+        self.cursor_line = max(0, min(len(self.lines) - 1, self.cursor_line + offset))
+        self.cursor_column = min(self.cursor_column, len(self.lines[self.cursor_line]))
+
+    def __join_with_next_line(self):
+        """
+        Appends the line below the cursor line to the cursor line.
+        """
+        self.lines[self.cursor_line] += self.lines.pop(self.cursor_line + 1)
+
+    def __render(self, changed):
+        """
+        Scrolls the visible lines so they contain the cursor line, renders the changed lines into
+        the pad and puts the cursor to its position in the pad.
+        :param changed: None if no line has changed, 'line' if only the cursor line has changed
+                        and 'all' if all visible lines must be rendered.
+        """
+        height = self.win.getmaxyx()[0]
+        first_line = self.__visibility_info.first_line
+        if self.cursor_line < first_line:
+            first_line = self.cursor_line
+        elif self.cursor_line >= first_line + height:
+            first_line = self.cursor_line - height + 1
+        if first_line != self.__visibility_info.first_line:
+            self.__visibility_info.first_line = first_line
+            changed = 'all'
+
+        if changed == 'all':
+            rows = range(height)
+        elif changed == 'line':
+            rows = [self.cursor_line - first_line]
+        else:
+            rows = []
+
+        for row in rows:
+            index = first_line + row
+            text = self.lines[index] if index < len(self.lines) else ''
+            self.ensure_capacity(len(text))
+            self.win.move(row, 0)
+            self.win.clrtoeol()
+            self.win.addstr(row, 0, text[:self.win.getmaxyx()[1] - 1])
+        self.win.move(self.cursor_line - first_line, min(self.cursor_column, self.win.getmaxyx()[1] - 1))
+
 
 class TurboLine:
     """
@@ -86,27 +361,55 @@ class TurboLine:
     supports auto completion.
     """
 
-    def __init__(self, y_start, x_start, width, max_length, commands=None, prompt=":"):
+    def __init__(self, y_start, x_start, width, max_length=None, commands=None, prompt=":", keymap=None,
+                 resize_handler=None, height=1):
         """
         The constructor.
         :param y_start: The vertical start position of the command line.
         :param x_start: The horizontal start position of the command line.
         :param width: The width of the command line.
         :param max_length: The maximum allowed length of input (may be longer than the width of the CLI).
+                           If no maximum length is provided, the input length is unbounded.
         :param commands: A TurboLineCmd object which contains the commands. If no object is provided
                          autocompletion is disabled.
         :param prompt: The prompt to show on input (colon per default).
+        :param keymap: A TurboLineKeymap which maps keys to actions. If no keymap is provided,
+                       the default bindings are used.
+        :param resize_handler: A method which is called with this TurboLine if the terminal is resized
+                               while taking input. It should call move() to place the line in the new
+                               layout. If no handler is provided, the line is clamped to the new screen size.
+        :param height: The number of visible lines. With a height greater than 1, the TurboLine takes multi-line
+                       input (see TurboLineMultilineTextbox) and max_length limits the length of every line.
         """
         self.prompt = prompt
-        self.__prompt_window = curses.newwin(1, width, y_start, x_start)
+        self.resize_handler = resize_handler
+        self.__editing = False
+        self.__prompt_window = curses.newwin(height, width, y_start, x_start)
         self.__prompt_window.refresh()
-        self.__visibility_info = TurboLineVisibilityInfo(0, 0, y_start, x_start + len(prompt), y_start,
-                                                         x_start + width)
+        self.__visibility_info = TurboLineVisibilityInfo(0, 0, y_start, x_start + len(prompt),
+                                                         y_start + height - 1, x_start + width)
         self.y_start = y_start
         self.x_start = x_start
-        self.__text_box_window = curses.newpad(1, max_length)
-        self.__text_box = TurboLineTextbox(self.__text_box_window, self.__visibility_info)
-        self.validator = TurboLineValidator(self.__text_box_window, self.__text_box)
+        self.width = width
+        self.height = height
+        # The position and width requested by the user. Clamping to the screen always starts from here,
+        # so the line grows back once the screen does.
+        self.__layout = (y_start, x_start, width)
+        # The pad starts with room for the visible width and grows on demand.
+        pad_width = (width // PAD_CHUNK_SIZE + 1) * PAD_CHUNK_SIZE
+        if max_length is not None:
+            pad_width = min(pad_width, max_length)
+        self.__text_box_window = curses.newpad(height, pad_width)
+        if height > 1:
+            # The arrow and page keys move the cursor in multi-line mode instead of traveling through the history.
+            if keymap is None:
+                keymap = TurboLineKeymap(MULTILINE_KEY_BINDINGS)
+            self.__text_box = TurboLineMultilineTextbox(self.__text_box_window, self.__visibility_info, max_length)
+        else:
+            self.__text_box = TurboLineTextbox(self.__text_box_window, self.__visibility_info, max_length)
+        self.validator = TurboLineValidator(self.__text_box_window, self.__text_box, keymap)
+        self.keymap = self.validator.keymap
+        self.validator.set_resize_handler(self.__handle_resize)
         self.__commands = commands
         if self.__commands is not None:
             assert isinstance(commands, cmd.Cmd)
@@ -122,38 +425,85 @@ class TurboLine:
         :param preset_text: The text to insert as preset (optional).
         :return: The user input as string.
         """
+        self.start_input(preset_text)
+
+        # We make sure that the cursor is visible before we start the input and set it back
+        # to whatever it was before we started afterwards. The same goes for the delay curses
+        # waits after ESC to detect escape sequences, which defaults to the OS default (1000ms).
+        old_state = curses.curs_set(1)
+        old_escape_delay = set_escape_delay(self.keymap.escape_timeout)
+
+        try:
+            input_text = None
+            while input_text is None:
+                input_text = self.process_key(self.read_key())
+        finally:
+            self.__editing = False
+            set_escape_delay(old_escape_delay)
+            curses.curs_set(old_state)
+        return input_text
+
+    def start_input(self, preset_text=''):
+        """
+        Starts taking input without waiting for it. Use this together with read_key and
+        process_key to drive the TurboLine from your own input loop (see TurboLineMultiplexer).
+        :param preset_text: The text to insert as preset (optional).
+        """
         # Make sure we start with a clear line.
         self.clear()
 
         # Draw the prompt and the preset text.
         self.__prompt_window.addstr(0, 0, self.prompt)
-        self.__text_box_window.addstr(preset_text)
+        self.__text_box.set_text(preset_text)
 
         # Adjust the beginning of the input pad to start after the prompt.
-        self.__visibility_info.top_x = len(self.prompt)
+        self.__visibility_info.top_x = self.x_start + len(self.prompt)
         refresh_pad_visibility(self.__text_box_window, self.__visibility_info)
 
         self.__prompt_window.refresh()
+        self.__editing = True
 
-        # We make sure that the cursor is visible before we start the input and set it back
-        # to whatever it was before we started afterwards.
-        old_state = curses.curs_set(1)
+    def read_key(self):
+        """
+        Puts the cursor into the line and waits for the next key press.
+        :return: The character code of the pressed key.
+        """
+        # We must refresh first, so the cursor is put to the right position for preset text.
+        # If we are not taking input, the line shows a message from its beginning.
+        refresh_pad_visibility(self.__text_box_window, self.__visibility_info, not self.__editing)
+        return self.__text_box_window.getch()
 
-        # The input ends with a space, we strip that.
-        try:
-            input_text = self.__text_box.edit(self.validator.validate).rstrip()
-        finally:
-            curses.curs_set(old_state)
+    def process_key(self, ch):
+        """
+        Processes a single key press of the current input. Once the input is finished, it is
+        added to the history and the according command is executed, if we have a command object.
+        :param ch: The character code of the pressed key.
+        :return: None while the input goes on, the user input as string once it is finished.
+        """
+        if self.__text_box.process_key(ch, self.validator.validate):
+            return None
+        self.__editing = False
 
+        # The input ends with a space, we strip that.
+        input_text = self.__text_box.gather().rstrip()
         self.validator.history.append(input_text)
         self.validator.reset()
         self.clear()
 
-        # Execute the according command, if we have a command object.
+        # Execute the according command, if we have a command object. The command object may be
+        # shared by several lines, so we make sure its output goes to this one.
         if self.__commands:
+            self.__commands.set_turboline(self)
             self.__commands.onecmd(input_text)
         return input_text
 
+    def is_editing(self):
+        """
+        Returns whether the line is currently taking input.
+        :return: True, if the line is taking input.
+        """
+        return self.__editing
+
     def output(self, text, format=curses.A_NORMAL):
         """
         Prints the given text as message in the command line.
@@ -169,13 +519,96 @@ class TurboLine:
         # our help implementation does.
         adjusted_text = adjusted_text.strip('\t')
         adjusted_text = adjusted_text.strip()
+
+        # Make sure the message fits into the pad, if the pad is limited by max_length.
+        self.__text_box.ensure_capacity(len(adjusted_text))
+        adjusted_text = adjusted_text[:self.__text_box_window.getmaxyx()[1] - 1]
         self.__text_box_window.addstr(0, 0, adjusted_text, format)
 
         # We do not want to show a prompt, so we move the pad to the beginning of the line.
-        self.__visibility_info.top_x = 0
+        self.__visibility_info.top_x = self.x_start
         self.__prompt_window.refresh()
         refresh_pad_visibility(self.__text_box_window, self.__visibility_info, True)
 
+    def move(self, y_start, x_start, width):
+        """
+        Moves and resizes the command line, e.g. after the terminal has been resized. This can also
+        be done while taking input, the entered text and the cursor position are kept.
+        :param y_start: The new vertical start position of the command line.
+        :param x_start: The new horizontal start position of the command line.
+        :param width: The new width of the command line. It must leave room for the prompt and
+                      at least one character of input.
+        """
+        if width < self.get_minimum_width():
+            raise ValueError('The width of the TurboLine must be at least ' + str(self.get_minimum_width()) + '.')
+        self.__layout = (y_start, x_start, width)
+        self.__place(y_start, x_start, width)
+
+    def __place(self, y_start, x_start, width):
+        """
+        Moves and resizes the windows of the command line and redraws it.
+        :param y_start: The new vertical start position of the command line.
+        :param x_start: The new horizontal start position of the command line.
+        :param width: The new width of the command line.
+        """
+        # A window must fit on the screen at any time, so we shrink it before moving it
+        # and grow it afterwards.
+        self.__prompt_window.resize(self.height, min(width, self.width))
+        self.__prompt_window.mvwin(y_start, x_start)
+        self.__prompt_window.resize(self.height, width)
+
+        self.y_start = y_start
+        self.x_start = x_start
+        self.width = width
+        self.__visibility_info.top_y = y_start
+        self.__visibility_info.bottom_y = y_start + self.height - 1
+        self.__visibility_info.top_x = x_start + (len(self.prompt) if self.__editing else 0)
+        self.__visibility_info.bottom_x = x_start + width
+
+        # Redraw the line at its new position.
+        self.__prompt_window.clear()
+        if self.__editing:
+            self.__prompt_window.addstr(0, 0, self.prompt)
+        self.__prompt_window.refresh()
+        refresh_pad_visibility(self.__text_box_window, self.__visibility_info, not self.__editing)
+
+    def __handle_resize(self):
+        """
+        Called by the validator if the terminal is resized while taking input. Hands the resize to
+        the resize handler, or clamps the line to the new screen size if there is none.
+        """
+        curses.update_lines_cols()
+        if self.resize_handler is not None:
+            self.resize_handler(self)
+        else:
+            self.clamp_to_screen()
+
+    def get_minimum_width(self):
+        """
+        Returns the smallest width the line can have: the prompt and one character of input.
+        :return: The minimum width.
+        """
+        return len(self.prompt) + 1
+
+    def clamp_to_screen(self):
+        """
+        Moves and shrinks the line (as given to the constructor or to move) as far as necessary to fit
+        on the (possibly resized) screen. The line
+        is moved to the left or up rather than shrunk below its minimum width or its height. If the
+        screen is too small to hold the line at all, it is left where it is and only the part of it
+        which is still on the screen is shown until the next resize.
+        """
+        curses.update_lines_cols()
+        minimum_width = self.get_minimum_width()
+        if curses.LINES < self.height or curses.COLS - 1 < minimum_width:
+            return
+
+        requested_y, requested_x, requested_width = self.__layout
+        width = max(minimum_width, min(requested_width, curses.COLS - 1))
+        x_start = min(requested_x, curses.COLS - 1 - width)
+        y_start = min(requested_y, curses.LINES - self.height)
+        self.__place(y_start, x_start, width)
+
     def get_history(self):
         """
         Gets the command history from the embedded validator.
@@ -189,6 +622,44 @@ class TurboLine:
         :param history: A list of commands which will be available as history.
         """
         self.validator.history = history
+        self.validator.history_pos = len(history)
+
+    def save_snapshot(self, path):
+        """
+        Saves the history and the argument lists of the command object (see TurboLineCmd.set_argument_list)
+        to a compact binary snapshot file. To save the snapshot on exit, register this method with atexit.
+        :param path: The path of the snapshot file. An existing file is replaced.
+        """
+        argument_lists = self.__commands.get_argument_lists() if self.__commands else dict()
+        TurboLineSnapshot.write(path, self.__get_fingerprint(), self.get_history(), argument_lists)
+
+    def load_snapshot(self, path):
+        """
+        Loads a snapshot saved by save_snapshot. The snapshot is only used if it has been saved for the
+        same set of commands. The file is memory-mapped and its argument lists are handed to the command object
+        as they are; each one is only decoded when it is first used, so nothing has to be rebuilt on startup.
+        A damaged argument list is treated as empty.
+        :param path: The path of the snapshot file.
+        :return: True, if the snapshot has been loaded. False, if it is missing, damaged or outdated.
+        """
+        snapshot = TurboLineSnapshot.read(path, self.__get_fingerprint())
+        if snapshot is None:
+            return False
+
+        history, argument_lists = snapshot
+        self.set_history(history)
+        if self.__commands:
+            for command, arguments in argument_lists.items():
+                self.__commands.set_argument_list(command, arguments)
+        return True
+
+    def __get_fingerprint(self):
+        """
+        Returns the fingerprint of the command set a snapshot of this line belongs to.
+        """
+        if self.__commands:
+            return self.__commands.get_fingerprint()
+        return hashlib.sha1().digest()
 
     def fetch_current_input(self):
         """
@@ -199,24 +670,198 @@ class TurboLine:
 
     def clear(self):
         """
-        Clears the line from all content.
+        Clears the line from all content and shrinks the pad back to its initial size.
         """
-        self.__text_box_window.clear()
+        self.__text_box.clear()
         self.__prompt_window.clear()
         self.__prompt_window.refresh()
 
 
+class TurboLineMultiplexer:
+    """
+    The multiplexer runs several TurboLines (e.g. one per pane) with a single input loop. All lines
+    share one TurboLineCmd and one TurboLineKeymap (multi-line lines share a second keymap, in which the
+    arrow and page keys move the cursor), so every extra line only holds its own history,
+    its input buffer and a few curses windows. Keys are routed to the focused line; the focus can
+    be switched by the user with a key sequence (CTRL + W, w per default, like in vim) or by calling
+    focus() or focus_next().
+    """
+
+    def __init__(self, commands=None, keymap=None, focus_keys=(23, 'w'), resize_handler=None,
+                 multiline_keymap=None):
+        """
+        The constructor.
+        :param commands: A TurboLineCmd object which is shared by all lines. If no object is provided
+                         autocompletion is disabled.
+        :param keymap: A TurboLineKeymap whose bindings are used by all lines. The multiplexer works on a copy
+                       of it, which is available as the keymap attribute. If no keymap is provided, the
+                       default bindings are used.
+        :param focus_keys: The key or key sequence which moves the focus to the next line, or None
+                           if the user should not be able to switch the focus.
+        :param resize_handler: A method which is called with this multiplexer if the terminal is resized
+                               while taking input. It should call move() on the lines to place them in
+                               the new layout. If no handler is provided, all lines are clamped to the
+                               new screen size.
+        :param multiline_keymap: A TurboLineKeymap whose bindings are used by all multi-line lines. The multiplexer
+                                 works on a copy of it, which is available as the multiline_keymap attribute.
+                                 If no keymap is provided, the bindings of keymap are used, except for the
+                                 history bindings of the arrow and page keys.
+        """
+        self.commands = commands
+        # We bind the focus keys, so we must not change the keymap we have been given.
+        self.keymap = keymap.copy() if keymap is not None else TurboLineKeymap()
+        if multiline_keymap is not None:
+            self.multiline_keymap = multiline_keymap.copy()
+        else:
+            self.multiline_keymap = self.keymap.copy()
+            for key in (curses.KEY_PPAGE, curses.KEY_NPAGE, curses.KEY_UP, curses.KEY_DOWN):
+                if self.multiline_keymap.get_binding(key) in HISTORY_ACTIONS:
+                    self.multiline_keymap.unbind(key)
+        self.resize_handler = resize_handler
+        self.lines = list()
+        self.__focused_line = None
+        self.__focus_key = None
+        if focus_keys is not None:
+            self.keymap.bind(focus_keys, self.__focus_next_action)
+            self.multiline_keymap.bind(focus_keys, self.__focus_next_action)
+            first_focus_key = focus_keys if isinstance(focus_keys, int) else focus_keys[0]
+            self.__focus_key = ord(first_focus_key) if isinstance(first_focus_key, str) else first_focus_key
+
+    def add_line(self, y_start, x_start, width, max_length=None, prompt=":", height=1):
+        """
+        Creates a new TurboLine which shares the command object and the keymap of the multiplexer
+        (or its multiline_keymap, if the line has more than one line). The first line added gets the focus.
+        :param y_start: The vertical start position of the command line.
+        :param x_start: The horizontal start position of the command line.
+        :param width: The width of the command line.
+        :param max_length: The maximum allowed length of input, or None for an unbounded input length.
+        :param prompt: The prompt to show on input (colon per default).
+        :param height: The number of visible lines (see TurboLine).
+        :return: The new TurboLine.
+        """
+        keymap = self.multiline_keymap if height > 1 else self.keymap
+        line = TurboLine(y_start, x_start, width, max_length, self.commands, prompt, keymap,
+                         self.__handle_resize, height)
+        self.lines.append(line)
+        if self.__focused_line is None:
+            self.__focused_line = line
+        return line
+
+    def remove_line(self, line):
+        """
+        Removes the given line from the multiplexer. If it had the focus, the focus moves to the next line.
+        :param line: The TurboLine to remove.
+        """
+        if line is self.__focused_line:
+            self.focus_next()
+        self.lines.remove(line)
+        line.clear()
+        if line is self.__focused_line:
+            self.__focused_line = None
+
+    def get_focused_line(self):
+        """
+        Returns the line which currently receives the key input.
+        :return: The focused TurboLine, or None if there are no lines.
+        """
+        return self.__focused_line
+
+    def focus(self, line):
+        """
+        Moves the focus to the given line. If the line is not taking input yet, it starts to
+        with the first key press, so the output of its last command stays visible until then.
+        Input which has been entered into the previously focused line is kept.
+        :param line: The TurboLine to focus.
+        """
+        self.__focused_line = line
+
+    def focus_next(self):
+        """
+        Moves the focus to the next line (or back to the first one).
+        """
+        if not self.lines:
+            return
+        if self.__focused_line is None:
+            self.focus(self.lines[0])
+            return
+        index = self.lines.index(self.__focused_line)
+        self.focus(self.lines[(index + 1) % len(self.lines)])
+
+    def input(self):
+        """
+        Takes input from the user on the focused line until the input of one line is finished and
+        returns it. If a command object has been provided, the command is executed directly after
+        the input. Unfinished input in the other lines is kept for the next call.
+
+        A line which is not taking input (e.g. because it shows the output of its last command) starts
+        a new input on the first key press which edits it. Switching the focus and resizing the terminal
+        leave the line as it is.
+        :return: A tuple of the TurboLine the input was entered in and the user input as string.
+        """
+        assert self.__focused_line is not None
+
+        # We make sure that the cursor is visible before we start the input and set it back
+        # to whatever it was before we started afterwards (see TurboLine.input).
+        old_state = curses.curs_set(1)
+        old_escape_delay = set_escape_delay(self.keymap.escape_timeout)
+
+        try:
+            while True:
+                # The focus may change with every key press.
+                line = self.__focused_line
+                ch = line.read_key()
+                if not line.is_editing() and self.__starts_input(line, ch):
+                    line.start_input()
+                input_text = line.process_key(ch)
+                if input_text is not None:
+                    return line, input_text
+        finally:
+            set_escape_delay(old_escape_delay)
+            curses.curs_set(old_state)
+
+    def __starts_input(self, line, ch):
+        """
+        Decides whether the given key starts a new input on a line which is not taking input.
+        Keys bound to the resize action and the (first) focus key do not, so the line keeps
+        showing the output of its last command. The validator handles them on the idle line.
+        :param line: The focused TurboLine.
+        :param ch: The character code of the pressed key.
+        :return: True, if the line should start a new input before the key is processed.
+        """
+        return ch != self.__focus_key and line.keymap.get_binding(ch) != 'resize'
+
+    def __focus_next_action(self, validator, ch):
+        """
+        The keymap action to move the focus to the next line.
+        """
+        self.focus_next()
+        return 0
+
+    def __handle_resize(self, turboline):
+        """
+        Called by the focused line if the terminal is resized while taking input. Hands the resize
+        to the resize handler, or clamps all lines to the new screen size if there is none.
+        """
+        if self.resize_handler is not None:
+            self.resize_handler(self)
+        else:
+            for line in self.lines:
+                line.clamp_to_screen()
+
+
 class TurboLineValidator:
     """
     The content validator. The validator parses any given key input and adjusts
     it to reflect the desired behavior of the vim-like input line.
     """
 
-    def __init__(self, textbox_target_pad, textbox):
+    def __init__(self, textbox_target_pad, textbox, keymap=None):
         """
         The constructor.
         :param textbox_target_pad: The pad which contains the Textbox.
         :param textbox: The Textbox object itself.
+        :param keymap: The TurboLineKeymap used to dispatch key input. If no keymap
+                       is provided, a keymap with the default bindings is created.
         """
         self.history = list()
         self.textbox_target_pad = textbox_target_pad
@@ -224,7 +869,23 @@ class TurboLineValidator:
         self.history_pos = 0
         self.completion_iteration = 0
         self.completion_text = None
+        self.keymap = keymap if keymap is not None else TurboLineKeymap()
         self.__commands = None
+        self.__resize_handler = None
+
+        # The named actions which can be bound to keys in the keymap.
+        self.__actions = {
+            'complete': self.__complete,
+            'line_start': self.__line_start,
+            'line_end': self.__line_end,
+            'delete_char': self.__delete_char,
+            'history_first': self.__history_first,
+            'history_last': self.__history_last,
+            'history_previous': self.__history_previous,
+            'history_next': self.__history_next,
+            'cancel': self.__cancel,
+            'resize': self.__resize,
+        }
 
     def set_commands(self, commands):
         """
@@ -233,98 +894,139 @@ class TurboLineValidator:
         """
         self.__commands = commands
 
+    def set_resize_handler(self, resize_handler):
+        """
+        Takes the method to call when the terminal is resized. This setter is used by the
+        TurboLine on initialization.
+        """
+        self.__resize_handler = resize_handler
+
     def validate(self, ch):
         """
         This is the validation method which resembles most of the vim-like
         behavior. It is called by the Textbox on every user-keypress. It then
-        decides what to do depending on the pressed key and usually hands the pressed
-        key back to the Textbox when it has been processed.
-        """
-
-        # TAB: Autocomplete Matcher (should be the first hit to reset autocomplete iterations if
-        # on any other key than TAB.
-        if ch == 9:
-            if self.__commands:
-                current_input = self.textbox.gather().rstrip()
-                if self.completion_iteration == 0:
-                    self.completion_text = current_input
-                best_match = self.__commands.auto_complete_input(self.completion_text, self.completion_iteration)
-                if best_match is not None:
-                    self.completion_iteration += 1
-                    self.textbox_target_pad.clear()
-                    self.textbox_target_pad.addstr(0, 0, best_match)
-                return ch
-        else:
+        resolves the pressed key (and any key sequence it starts) through the keymap,
+        runs the bound action and usually hands a key back to the Textbox when it has
+        been processed. Keys without a binding are handed back unchanged.
+        """
+        action, ch = self.keymap.resolve(ch, self.textbox_target_pad)
+
+        # Any other action than completion resets the autocomplete iterations. A resize
+        # does not change the input, so the completion may go on afterwards.
+        if action not in ('complete', 'resize'):
             self.completion_iteration = 0
             self.completion_text = None
 
-        # HOME: Set the cursor to the beginning of the line.
-        if ch == 262:
-            return 1  # CTRL + A
+        if action is None:
+            return ch
+        if callable(action):
+            return action(self, ch)
+        return self.__actions[action](ch)
 
-        # END: Set the cursor to the end of the line.
-        if ch == 360:
-            return 5  # CTRL + E
+    def __complete(self, ch):
+        """
+        TAB: Autocomplete Matcher. Repeated calls cycle through the possible matches.
+        """
+        if self.__commands:
+            current_input = self.textbox.gather().rstrip()
+            if self.completion_iteration == 0:
+                self.completion_text = current_input
+            best_match = self.__commands.auto_complete_input(self.completion_text, self.completion_iteration)
+            if best_match is not None:
+                self.completion_iteration += 1
+                self.textbox.set_text(best_match)
+        return ch
 
-        # PAGE_UP: Jump to first history entry (bash-behavior)
-        if ch == 339:
-            # Nothing to do, we are already there.
-            if self.history_pos == 0:
-                return ch
-            self.__retain_current_input()
+    @staticmethod
+    def __line_start(ch):
+        """
+        HOME: Set the cursor to the beginning of the line.
+        """
+        return 1  # CTRL + A
 
-            self.history_pos = 0
-            self.textbox_target_pad.addstr(0, 0, self.history[self.history_pos])
-            return ch
+    @staticmethod
+    def __line_end(ch):
+        """
+        END: Set the cursor to the end of the line.
+        """
+        return 5  # CTRL + E
 
-        # PAGE_DOWN: Jump to last history entry (bash-behavior)
-        if ch == 338:
-            # Nothing to do, we are already there.
-            if self.history_pos > len(self.history) - 2:
-                return ch
-            self.__retain_current_input()
+    @staticmethod
+    def __delete_char(ch):
+        """
+        DEL: Remove the character under the cursor.
+        """
+        return 4  # CTRL + D
 
-            self.history_pos = len(self.history) - 1
-            self.textbox_target_pad.addstr(0, 0, self.history[self.history_pos])
+    def __history_first(self, ch):
+        """
+        PAGE_UP: Jump to first history entry (bash-behavior)
+        """
+        # Nothing to do, we are already there.
+        if self.history_pos == 0:
             return ch
+        self.__retain_current_input()
 
-        # UP: Travel up through the history.
-        if ch == 259:
-            # Prevent out of bounds access
-            if self.history_pos == 0:
-                return ch
-            self.__retain_current_input()
+        self.history_pos = 0
+        self.textbox.set_text(self.history[self.history_pos])
+        return ch
 
-            self.history_pos -= 1
-            self.textbox_target_pad.addstr(0, 0, self.history[self.history_pos])
+    def __history_last(self, ch):
+        """
+        PAGE_DOWN: Jump to last history entry (bash-behavior)
+        """
+        # Nothing to do, we are already there.
+        if self.history_pos > len(self.history) - 2:
             return ch
+        self.__retain_current_input()
 
-        # DOWN: Travel down through the history.
-        if ch == 258:
-            # Prevent out of bounds access
-            if self.history_pos > len(self.history) - 2:
-                return ch
-            self.__retain_current_input()
+        self.history_pos = len(self.history) - 1
+        self.textbox.set_text(self.history[self.history_pos])
+        return ch
 
-            self.history_pos += 1
-            self.textbox_target_pad.addstr(0, 0, self.history[self.history_pos])
+    def __history_previous(self, ch):
+        """
+        UP: Travel up through the history.
+        """
+        # Prevent out of bounds access
+        if self.history_pos == 0:
             return ch
+        self.__retain_current_input()
 
-        # DEL: Remove the character under the cursor.
-        if ch == 330:
-            return 4  # CTRL + D
+        self.history_pos -= 1
+        self.textbox.set_text(self.history[self.history_pos])
+        return ch
 
-        # ESC: Cancels the input. Be aware that curses uses the OS default (1000ms) to determine
-        # how long it should wait for a subsequent escape sequence key
-        # before passing the ESC key on. It is recommended to reduce this
-        # delay to 25ms. This is the same delay as vim uses (see:
-        # http://stackoverflow.com/questions/27372068/why-does-the-escape-key-have-a-delay-in-python-curses )
-        if ch == 27:
-            self.textbox_target_pad.clear()
-            return 7  # CTRL + G
+    def __history_next(self, ch):
+        """
+        DOWN: Travel down through the history.
+        """
+        # Prevent out of bounds access
+        if self.history_pos > len(self.history) - 2:
+            return ch
+        self.__retain_current_input()
 
+        self.history_pos += 1
+        self.textbox.set_text(self.history[self.history_pos])
         return ch
 
+    def __cancel(self, ch):
+        """
+        ESC: Cancels the input. The delay curses waits for a subsequent escape sequence key
+        is controlled by the escape_timeout of the keymap (see TurboLineKeymap).
+        """
+        self.textbox.clear()
+        return 7  # CTRL + G
+
+    def __resize(self, ch):
+        """
+        KEY_RESIZE: Lets the TurboLine adjust to the new terminal size. The input goes on
+        afterwards with the buffer and the cursor position intact.
+        """
+        if self.__resize_handler is not None:
+            self.__resize_handler()
+        return 0
+
     def __retain_current_input(self):
         """
         Checks the current input. If it differs from the input
@@ -338,7 +1040,7 @@ class TurboLineValidator:
                 self.history.insert(self.history_pos, current_input)
         else:
             self.history.append(current_input)
-        self.textbox_target_pad.clear()
+        self.textbox.clear()
 
     def reset(self):
         """
@@ -350,6 +1052,191 @@ class TurboLineValidator:
         self.completion_iteration = 0
 
 
+class TurboLineKeymapNode:
+    """
+    A single node of the keymap trie. Every node represents one key of a key sequence and holds
+    the action bound to the sequence ending at this node (if any) and the nodes of all longer
+    sequences starting with it.
+    """
+
+    def __init__(self):
+        """
+        The constructor.
+        """
+        self.action = None
+        self.children = dict()
+
+
+class TurboLineKeymap:
+    """
+    The keymap maps key codes and key sequences to actions. It is a trie of TurboLineKeymapNodes,
+    so looking up a single key is a plain dictionary access, while vim-style multi-key sequences
+    (e.g. 'jj' or ESC followed by a key) are resolved by walking down the trie.
+
+    An action is either the name of one of the validator actions ('complete', 'line_start', 'line_end',
+    'delete_char', 'history_first', 'history_last', 'history_previous', 'history_next', 'cancel', 'resize') or a
+    callable taking the TurboLineValidator and the last pressed key code. A callable returns the key
+    code which is handed to the Textbox afterwards (or 0 to swallow the key).
+
+    The bindings can be changed at runtime, e.g. turboline.keymap.bind('jj', 'cancel').
+    """
+
+    def __init__(self, bindings=None, escape_timeout=25, sequence_timeout=1000):
+        """
+        The constructor.
+        :param bindings: A dictionary mapping keys or key sequences to actions. Defaults to DEFAULT_KEY_BINDINGS.
+        :param escape_timeout: The time in ms to wait for a subsequent key after ESC before ESC is passed on
+                               as a single key. 25ms is the delay vim uses.
+        :param sequence_timeout: The time in ms to wait for the next key of any other key sequence.
+        """
+        self.escape_timeout = escape_timeout
+        self.sequence_timeout = sequence_timeout
+        self.__root = TurboLineKeymapNode()
+        if bindings is None:
+            bindings = DEFAULT_KEY_BINDINGS
+        for keys, action in bindings.items():
+            self.bind(keys, action)
+
+    def bind(self, keys, action):
+        """
+        Binds the given key or key sequence to an action. An existing binding is replaced.
+        :param keys: A key code, a character or a sequence of both (e.g. 27, 'jj' or (27, 'b')).
+        :param action: The name of a validator action or a callable (see class documentation).
+        """
+        node = self.__root
+        for key in self.__to_key_codes(keys):
+            node = node.children.setdefault(key, TurboLineKeymapNode())
+        node.action = action
+
+    def unbind(self, keys):
+        """
+        Removes the binding of the given key or key sequence. Keys without a binding are
+        passed on to the Textbox unchanged.
+        :param keys: A key code, a character or a sequence of both.
+        """
+        path = [self.__root]
+        for key in self.__to_key_codes(keys):
+            node = path[-1].children.get(key)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].action = None
+
+        # Prune nodes which neither hold an action nor lead to one.
+        key_codes = self.__to_key_codes(keys)
+        for depth in range(len(key_codes), 0, -1):
+            node = path[depth]
+            if node.action is not None or node.children:
+                break
+            del path[depth - 1].children[key_codes[depth - 1]]
+
+    def get_binding(self, keys):
+        """
+        Returns the action bound to the given key or key sequence.
+        :param keys: A key code, a character or a sequence of both.
+        :return: The bound action or None, if there is no binding.
+        """
+        node = self.__root
+        for key in self.__to_key_codes(keys):
+            node = node.children.get(key)
+            if node is None:
+                return None
+        return node.action
+
+    def get_bindings(self):
+        """
+        Returns all bindings of the keymap.
+        :return: A dictionary mapping key codes (or tuples of key codes for key sequences) to actions.
+        """
+        bindings = dict()
+        pending = [((), self.__root)]
+        while pending:
+            keys, node = pending.pop()
+            if node.action is not None:
+                bindings[keys[0] if len(keys) == 1 else keys] = node.action
+            pending.extend((keys + (key,), child) for key, child in node.children.items())
+        return bindings
+
+    def copy(self):
+        """
+        Returns a copy of the keymap with the same bindings and timeouts. Changing the copy does not
+        change this keymap.
+        :return: The new TurboLineKeymap.
+        """
+        return TurboLineKeymap(self.get_bindings(), self.escape_timeout, self.sequence_timeout)
+
+    def resolve(self, ch, window):
+        """
+        Resolves the given key to an action. If the key starts a key sequence, subsequent keys are read
+        from the given window until the sequence is complete, no longer matches or the timeout expires.
+        The longest bound sequence wins; keys read beyond it are pushed back to curses, so they are
+        processed as regular input afterwards.
+        :param ch: The key code of the pressed key.
+        :param window: The window to read subsequent keys of a key sequence from.
+        :return: A tuple of the resolved action (None, if the key has no binding) and the last key code
+                 belonging to it.
+        """
+        node = self.__root.children.get(ch)
+        if node is None:
+            return None, ch
+        if not node.children:
+            return node.action, ch
+
+        pressed = [ch]
+        matched_action, matched_length = node.action, 1
+        window.timeout(self.escape_timeout if ch == 27 else self.sequence_timeout)
+        try:
+            while node.children:
+                next_ch = window.getch()
+                if next_ch == -1:
+                    break
+                pressed.append(next_ch)
+                node = node.children.get(next_ch)
+                if node is None:
+                    break
+                if node.action is not None:
+                    matched_action, matched_length = node.action, len(pressed)
+        finally:
+            window.timeout(-1)
+
+        # Push back everything which does not belong to the matched sequence. curses returns
+        # pushed back keys in reverse order.
+        for key in reversed(pressed[matched_length:]):
+            curses.ungetch(key)
+        return matched_action, pressed[matched_length - 1]
+
+    @staticmethod
+    def __to_key_codes(keys):
+        """
+        Converts a key, a character or a sequence of both to a list of key codes.
+        """
+        if isinstance(keys, (int, str)):
+            keys = [keys] if isinstance(keys, int) else list(keys)
+        return [ord(key) if isinstance(key, str) else key for key in keys]
+
+
+# The key bindings every TurboLine starts with.
+DEFAULT_KEY_BINDINGS = {
+    9: 'complete',  # TAB
+    curses.KEY_HOME: 'line_start',
+    curses.KEY_END: 'line_end',
+    curses.KEY_PPAGE: 'history_first',
+    curses.KEY_NPAGE: 'history_last',
+    curses.KEY_UP: 'history_previous',
+    curses.KEY_DOWN: 'history_next',
+    curses.KEY_DC: 'delete_char',
+    27: 'cancel',  # ESC
+    curses.KEY_RESIZE: 'resize',
+}
+
+# The actions which travel through the history.
+HISTORY_ACTIONS = ('history_first', 'history_last', 'history_previous', 'history_next')
+
+# The key bindings of a multi-line TurboLine. The arrow and page keys are handled by the Textbox.
+MULTILINE_KEY_BINDINGS = {key: action for key, action in DEFAULT_KEY_BINDINGS.items()
+                          if key not in (curses.KEY_PPAGE, curses.KEY_NPAGE, curses.KEY_UP, curses.KEY_DOWN)}
+
+
 class TurboLineCmd(cmd.Cmd):
     """
     The TurboLineCmd is an adjusted version of the usual Python Cmd. If you are
@@ -382,18 +1269,58 @@ class TurboLineCmd(cmd.Cmd):
         self.__turboline = None
 
         # We collect the method names at construction time, so we do not have to
-        # do reflection magic every time we want to autocomplete something.
+        # do reflection magic every time we want to autocomplete something. The names
+        # never change afterwards, so one command object can be shared by several lines.
         method_names = dir(self.__class__)
-        self.__command_names = [c[3:] for c in method_names if c.startswith('do_')]
-        self.__completion_names = [c[9:] for c in method_names if c.startswith('complete_')]
-        self.__help_names = [c[5:] for c in method_names if c.startswith('help_')]
+        self.__command_names = tuple(c[3:] for c in method_names if c.startswith('do_'))
+        self.__completion_names = frozenset(c[9:] for c in method_names if c.startswith('complete_'))
+        self.__help_names = frozenset(c[5:] for c in method_names if c.startswith('help_'))
+        self.__argument_lists = dict()
 
     def set_turboline(self, turboline):
         """
-        A setter for the TurboLine itself. Only used by the TurboLine.
+        A setter for the TurboLine itself. Only used by the TurboLine. If the command object
+        is shared by several lines, this is the line which executed the latest command.
         """
         self.__turboline = turboline
 
+    def set_argument_list(self, command, arguments):
+        """
+        Stores a list of allowed arguments for the given command, e.g. to be used with _auto_match_list
+        in the argument completion method. Stored argument lists are part of the snapshot of the TurboLine
+        (see TurboLine.save_snapshot), so lists which are expensive to build do not have to be rebuilt
+        on every start.
+        :param command: The command name (e.g. "foo").
+        :param arguments: A sequence of allowed arguments (e.g. "bartender", "coffeebar" "persimmon").
+        """
+        self.__argument_lists[command] = arguments
+
+    def get_argument_list(self, command):
+        """
+        Returns the list of allowed arguments stored for the given command.
+        :param command: The command name (e.g. "foo").
+        :return: The sequence of allowed arguments, or None if no list has been stored.
+        """
+        return self.__argument_lists.get(command)
+
+    def get_argument_lists(self):
+        """
+        Returns all stored argument lists.
+        :return: A dictionary mapping command names to their sequences of allowed arguments.
+        """
+        return dict(self.__argument_lists)
+
+    def get_fingerprint(self):
+        """
+        Returns a fingerprint of the command set. A snapshot is only used if it has been saved with the
+        same fingerprint, so it is discarded once commands or argument completions are added or removed.
+        :return: The fingerprint as bytes.
+        """
+        fingerprint = hashlib.sha1()
+        for name in self.__command_names + ('',) + tuple(sorted(self.__completion_names)):
+            fingerprint.update(name.encode('utf-8') + b'\0')
+        return fingerprint.digest()
+
     def write(self, text, format=curses.A_NORMAL):
         """
         This method is used to write text back to the line (e.g. "Unknown command: ...").
@@ -619,6 +1546,176 @@ class TurboLineCmd(cmd.Cmd):
         return regex
 
 
+class TurboLineSnapshotList(collections.abc.Sequence):
+    """
+    A read-only list of strings which lives in the memory-mapped buffer of a snapshot file. In the file, the list
+    is stored as the number of entries, the size of the UTF-8 encoded text of all entries, the character offsets
+    at which the entries end (starting with 0) and the text itself.
+
+    Loading a list only checks that it lies inside the buffer. Its text is decoded and validated on first access
+    and split into the entries, which are kept, so completing against the list costs no more than completing
+    against a plain list. A damaged list is treated as empty (see is_damaged).
+    """
+
+    __HEADER = struct.Struct('<II')
+    __OFFSET = struct.Struct('<I')
+
+    def __init__(self, buffer, position):
+        """
+        The constructor. Checks that the list lies inside the buffer, but does not decode it yet.
+        :param buffer: The buffer containing the list.
+        :param position: The position of the list in the buffer.
+        """
+        self.__buffer = buffer
+        self.__count, size = self.__HEADER.unpack_from(buffer, position)
+        self.__offsets_position = position + self.__HEADER.size
+        self.__text_position = self.__offsets_position + self.__OFFSET.size * (self.__count + 1)
+        self.end = self.__text_position + size
+        if self.end > len(buffer):
+            raise ValueError('Truncated snapshot list.')
+        self.__entries = None
+        self.__damaged = False
+
+    def __len__(self):
+        return len(self.__get_entries())
+
+    def __getitem__(self, index):
+        return self.__get_entries()[index]
+
+    def __iter__(self):
+        return iter(self.__get_entries())
+
+    def is_damaged(self):
+        """
+        Decodes the list, if that has not happened yet, and returns whether it is damaged.
+        :return: True, if the text or the offsets of the list are invalid.
+        """
+        self.__get_entries()
+        return self.__damaged
+
+    def __get_entries(self):
+        """
+        Returns the entries as tuple, decoding them from the buffer on first access.
+        """
+        if self.__entries is None:
+            try:
+                self.__entries = self.__decode()
+            except ValueError:
+                # This includes a UnicodeDecodeError for damaged text.
+                self.__entries = ()
+                self.__damaged = True
+            # Once every list has been decoded, the buffer is no longer referenced and gets unmapped.
+            self.__buffer = None
+        return self.__entries
+
+    def __decode(self):
+        """
+        Decodes and validates the text of the list and splits it into the entries.
+        :return: The entries as tuple.
+        """
+        offsets = struct.unpack_from('<%dI' % (self.__count + 1), self.__buffer, self.__offsets_position)
+        text = self.__buffer[self.__text_position:self.end].decode('utf-8')
+        if offsets[0] != 0 or offsets[-1] != len(text) or \
+                any(start > end for start, end in zip(offsets, offsets[1:])):
+            raise ValueError('Invalid snapshot list offsets.')
+        return tuple(text[start:end] for start, end in zip(offsets, offsets[1:]))
+
+    @classmethod
+    def encode(cls, strings):
+        """
+        Encodes the given strings to the binary list format.
+        :param strings: A sequence of strings.
+        :return: The encoded list as bytes.
+        """
+        offsets = [0]
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        text = ''.join(strings).encode('utf-8')
+        return cls.__HEADER.pack(len(offsets) - 1, len(text)) + struct.pack('<%dI' % len(offsets), *offsets) + text
+
+
+class TurboLineSnapshot:
+    """
+    Reads and writes the snapshot files of the TurboLine. A snapshot file consists of a header with the
+    fingerprint of the command set, followed by the history, the names of the commands with argument lists
+    and the argument lists themselves (all stored as TurboLineSnapshotList).
+    """
+
+    MAGIC = b'TLSNAP'
+    VERSION = 1
+    __HEADER = struct.Struct('<6sB20s')
+
+    @classmethod
+    def write(cls, path, fingerprint, history, argument_lists):
+        """
+        Writes a snapshot file. The file is written to a temporary file next to it first and replaced
+        atomically, so an existing snapshot is never left half-written, even if several lines or
+        processes save to the same path at once.
+        :param path: The path of the snapshot file (a string or a path-like object).
+        :param fingerprint: The fingerprint of the command set (see TurboLineCmd.get_fingerprint).
+        :param history: The list of history entries.
+        :param argument_lists: A dictionary mapping command names to their sequences of allowed arguments.
+        """
+        commands = sorted(argument_lists)
+        content = [cls.__HEADER.pack(cls.MAGIC, cls.VERSION, fingerprint),
+                   TurboLineSnapshotList.encode(history),
+                   TurboLineSnapshotList.encode(commands)]
+        content += [TurboLineSnapshotList.encode(argument_lists[command]) for command in commands]
+
+        path = os.fspath(path)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                         delete=False) as snapshot_file:
+            temporary_path = snapshot_file.name
+            try:
+                snapshot_file.write(b''.join(content))
+            except BaseException:
+                snapshot_file.close()
+                os.remove(temporary_path)
+                raise
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def read(cls, path, fingerprint):
+        """
+        Memory-maps a snapshot file and validates it against the given fingerprint. The history and the
+        command names are decoded right away. The argument lists are used from the map directly and only
+        decoded when they are first accessed; the map stays open as long as one of them has not been.
+        :param path: The path of the snapshot file.
+        :param fingerprint: The fingerprint of the current command set.
+        :return: A tuple of the history as list and a dictionary mapping command names to their argument lists
+                 (as TurboLineSnapshotLists), or None if the file is missing, damaged or outdated.
+        """
+        try:
+            with open(path, 'rb') as snapshot_file:
+                buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, version, file_fingerprint = cls.__HEADER.unpack_from(buffer, 0)
+            if magic != cls.MAGIC or version != cls.VERSION or file_fingerprint != fingerprint:
+                buffer.close()
+                return None
+
+            history = TurboLineSnapshotList(buffer, cls.__HEADER.size)
+            commands = TurboLineSnapshotList(buffer, history.end)
+            argument_lists = dict()
+            position = commands.end
+            for command in commands:
+                argument_lists[command] = TurboLineSnapshotList(buffer, position)
+                position = argument_lists[command].end
+        except (struct.error, ValueError):
+            buffer.close()
+            return None
+
+        # We need the history and the command names right away, so they must be intact.
+        if history.is_damaged() or commands.is_damaged():
+            buffer.close()
+            return None
+        return list(history), argument_lists
+
+
 def refresh_pad_visibility(target_pad, visibility_info, reset_view=False):
     """
     A helper method to refresh the pad and adjusting the displayed portion of
@@ -641,9 +1738,32 @@ def refresh_pad_visibility(target_pad, visibility_info, reset_view=False):
         elif current_cursor_pos[1] < visibility_info.content_pos_x:
             visibility_info.content_pos_x = current_cursor_pos[1]
 
+    # The screen may have become too small for the pad while taking input. We only draw
+    # the part which is still on the screen, since curses refuses to draw beyond it.
+    bottom_y = min(visibility_info.bottom_y, curses.LINES - 1)
+    bottom_x = min(visibility_info.bottom_x, curses.COLS - 1)
+    if bottom_y < visibility_info.top_y or bottom_x < visibility_info.top_x:
+        return
+
     target_pad.refresh(visibility_info.content_pos_y,
                        visibility_info.content_pos_x,
                        visibility_info.top_y,
                        visibility_info.top_x,
-                       visibility_info.bottom_y,
-                       visibility_info.bottom_x)
+                       bottom_y,
+                       bottom_x)
+
+
+def set_escape_delay(delay):
+    """
+    A helper method to set the time curses waits after an ESC keypress for a subsequent escape
+    sequence key. Setting the delay requires Python 3.9; on older versions the ESCDELAY
+    environment variable has to be set before curses is initialized instead.
+
+    :param delay: The delay in ms, or None to keep the current delay.
+    :return: The previous delay in ms, or None if the delay cannot be set.
+    """
+    if delay is None or not hasattr(curses, 'set_escdelay'):
+        return None
+    old_delay = curses.get_escdelay()
+    curses.set_escdelay(delay)
+    return old_delay
@@ -104,10 +104,11 @@ def start(stdscrn):
 
 
 if __name__ == '__main__':
-    # This is _highly_ recommended. By default, NCurses lets the operating system decide, how long a ESC keypress
-    # will be delayed until it is passed on to the application. If no default is set, you will have to wait 1000ms
-    # every time you press ESC before something happens. 25ms is the delay used by vim. The delay is usually only
-    # relevant if you intend to escape entered characters using the escape key anyway.
+    # TurboLine sets the delay NCurses waits after an ESC keypress itself while taking input (see the escape_timeout
+    # of the TurboLineKeymap). On Python < 3.9 this is not possible, so we fall back to the ESCDELAY environment
+    # variable. By default, NCurses lets the operating system decide, how long a ESC keypress will be delayed until
+    # it is passed on to the application. If no default is set, you will have to wait 1000ms every time you press
+    # ESC before something happens. 25ms is the delay used by vim.
 
     # In order to work, this must be called _before_ NCurses is initialized.
     os.environ.setdefault('ESCDELAY', '25')